@@ -1,8 +1,27 @@
 import os
+import threading
+from collections import OrderedDict
+import tracemalloc
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import textwrap
 import requests
 
+# Story-independent backgrounds keyed by (width, height)
+_backgrounds = {}
+
+# Per-thread canvas reused across renders
+_buffers = threading.local()
+
+# Custom fonts are loaded once per process so text masks can be cached against them
+_fonts = None
+
+# LRU cache of rasterized text masks keyed by (font path, size, text),
+# bounded by the total bytes of mask pixels it holds
+TEXT_MASK_CACHE_BYTES = 1024 * 1024
+_text_masks = OrderedDict()
+_text_masks_bytes = 0
+_text_masks_lock = threading.Lock()
+
 def download_font(font_url, font_path):
     """Download a font file from a URL if it doesn't exist locally."""
     if not os.path.exists(font_path):
@@ -15,6 +34,10 @@ def download_font(font_url, font_path):
 
 def get_fonts():
     """Get fonts that work in GitHub Actions environment."""
+    global _fonts
+    if _fonts is not None:
+        return _fonts
+    
     fonts_dir = "fonts"
     if not os.path.exists(fonts_dir):
         os.makedirs(fonts_dir)
@@ -40,6 +63,8 @@ def get_fonts():
         fonts['badge'] = ImageFont.truetype(
             download_font(font_urls['bold'], f"{fonts_dir}/Montserrat-Bold.ttf"), 20)
         print("Custom fonts loaded successfully")
+        # Only cache real fonts so a failed download is retried on the next render
+        _fonts = fonts
     except Exception as e:
         print(f"Warning: Could not load custom fonts: {e}")
         # Create larger default fonts
@@ -68,15 +93,68 @@ def create_rounded_rect(draw, coords, radius, fill):
     draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill)
     draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill)
 
-def generate_instagram_image(story, output_path="instagram_post.png"):
-    """Generate a 1080x1080 Instagram image for a dental news story."""
+def get_text_mask(text, font):
+    """Return the cached alpha mask for text and its offset from the draw origin.
+    
+    Each (font, size, text) is rasterized once; shadows and fills are then
+    stamped from the same mask at any colour and position. Fonts without a
+    file path (such as the load_default() fallback) are not cached.
+    """
+    global _text_masks_bytes
+    
+    path = getattr(font, 'path', None)
+    key = (path, getattr(font, 'size', None), text) if isinstance(path, str) else None
+    if key is not None:
+        with _text_masks_lock:
+            if key in _text_masks:
+                _text_masks.move_to_end(key)
+                return _text_masks[key]
+    
+    left, top, right, bottom = font.getbbox(text)
+    mask = None
+    if right > left and bottom > top:
+        mask = Image.new('L', (right - left, bottom - top), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+    entry = (mask, (left, top))
+    
+    size = mask.width * mask.height if mask is not None else 0
+    if key is None or size > TEXT_MASK_CACHE_BYTES:
+        return entry
+    
+    with _text_masks_lock:
+        if key not in _text_masks:
+            _text_masks[key] = entry
+            _text_masks_bytes += size
+        while _text_masks_bytes > TEXT_MASK_CACHE_BYTES:
+            _, (old_mask, _) = _text_masks.popitem(last=False)
+            if old_mask is not None:
+                _text_masks_bytes -= old_mask.width * old_mask.height
+    return entry
+
+def draw_text(image, xy, text, font, fill, shadow=None, shadow_offset=(2, 2)):
+    """Draw text from its cached mask, optionally with a shadow underneath."""
+    mask, (left, top) = get_text_mask(text, font)
+    if mask is None:
+        return
+    
+    x, y = xy
+    if shadow is not None:
+        dx, dy = shadow_offset
+        image.paste(shadow, (x + dx + left, y + dy + top), mask)
+    image.paste(fill, (x + left, y + top), mask)
+
+def get_background(width, height):
+    """Return the cached textured gradient background for the given size.
     
-    width = 1080
-    height = 1080
+    The background does not depend on the story, so it is rendered once and
+    pasted into the reusable canvas on every render.
+    """
+    key = (width, height)
+    if key in _backgrounds:
+        return _backgrounds[key]
     
-    # Create a more sophisticated gradient background
-    image = Image.new('RGB', (width, height))
-    draw = ImageDraw.Draw(image)
+    background = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(background)
     
     # Rich gradient from dark teal to deep blue
     for y in range(height):
@@ -87,18 +165,105 @@ def generate_instagram_image(story, output_path="instagram_post.png"):
         b = int(140 * (1 - ratio) + 160 * ratio)
         draw.rectangle([(0, y), (width, y + 1)], fill=(r, g, b))
     
-    # Add a subtle overlay pattern for texture
-    overlay = Image.new('RGBA', (width, height), (255, 255, 255, 0))
-    overlay_draw = ImageDraw.Draw(overlay)
-    
-    # Add subtle diagonal lines for texture
+    # Add subtle diagonal lines for texture, blended straight onto the
+    # gradient instead of through a full-size RGBA overlay
+    blend_draw = ImageDraw.Draw(background, 'RGBA')
     for i in range(0, width + height, 80):
-        overlay_draw.line([(i, 0), (0, i)], fill=(255, 255, 255, 10), width=1)
-        overlay_draw.line([(width, i), (i, height)], fill=(255, 255, 255, 10), width=1)
+        blend_draw.line([(i, 0), (0, i)], fill=(255, 255, 255, 10), width=1)
+        blend_draw.line([(width, i), (i, height)], fill=(255, 255, 255, 10), width=1)
+    
+    _backgrounds[key] = background
+    return background
+
+def get_canvas(width, height):
+    """Return a reusable RGB canvas reset to the textured background.
+    
+    Each thread keeps its own canvas so parallel renderers don't share pixels.
+    """
+    canvas = getattr(_buffers, 'canvas', None)
+    if canvas is None or canvas.size != (width, height):
+        canvas = Image.new('RGB', (width, height))
+        _buffers.canvas = canvas
+    canvas.paste(get_background(width, height), (0, 0))
+    return canvas
+
+def get_current_rss():
+    """Return the current resident set size in bytes, or None if unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def measure_render_memory(story, output_path="instagram_post.png", sample_interval=0.005):
+    """Render one image and report its peak memory usage.
+    
+    Returns a dict of byte counts for this render: the tracemalloc peak
+    (Python allocations) and the RSS before and at its peak while rendering.
+    Pillow's pixel buffers are allocated outside the Python allocator, so the
+    RSS growth is the figure that covers them. RSS is sampled from /proc and
+    is None on platforms without it. If the caller is already tracing with
+    tracemalloc, its recorded peak is reset and not restored.
+    """
+    rss_before = get_current_rss()
+    rss_samples = [rss_before]
+    done = threading.Event()
+    
+    def sample_rss():
+        while not done.wait(sample_interval):
+            rss_samples.append(get_current_rss())
+    
+    # Leave any tracing the caller already had running untouched
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    traced_before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    
+    sampler = None
+    if rss_before is not None:
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+    try:
+        generate_instagram_image(story, output_path)
+        _, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        done.set()
+        if sampler is not None:
+            sampler.join()
+        if started_tracing:
+            tracemalloc.stop()
+    
+    stats = {
+        'tracemalloc_peak': traced_peak - traced_before,
+        'rss_before': rss_before,
+        'rss_peak': None,
+    }
+    if rss_before is not None:
+        rss_samples.append(get_current_rss())
+        stats['rss_peak'] = max(sample for sample in rss_samples if sample is not None)
+    
+    print(f"Render memory - tracemalloc peak: {stats['tracemalloc_peak'] / 1024:.1f} KB", end="")
+    if stats['rss_peak'] is not None:
+        growth = stats['rss_peak'] - rss_before
+        print(f", peak RSS: {stats['rss_peak'] / (1024 * 1024):.1f} MB "
+              f"(+{growth / (1024 * 1024):.1f} MB during render)")
+    else:
+        print()
+    
+    return stats
+
+def generate_instagram_image(story, output_path="instagram_post.png"):
+    """Generate a 1080x1080 Instagram image for a dental news story."""
     
-    # Composite the overlay
-    image = Image.alpha_composite(image.convert('RGBA'), overlay)
+    width = 1080
+    height = 1080
+    
+    # Draw everything onto a single reused canvas; translucent elements are
+    # blended in place within their own bounds rather than via full-size layers
+    image = get_canvas(width, height)
     draw = ImageDraw.Draw(image)
+    blend_draw = ImageDraw.Draw(image, 'RGBA')
     
     # Get fonts
     fonts = get_fonts()
@@ -126,13 +291,12 @@ def generate_instagram_image(story, output_path="instagram_post.png"):
             radius=17, fill=yellow)
         
         # Add NEW text
-        draw.text((badge_x + badge_width//2 - 18, badge_y + 8), 
-                 "NEW", font=fonts['badge'], fill=(20, 20, 20))
+        draw_text(image, (badge_x + badge_width//2 - 18, badge_y + 8), 
+                  "NEW", fonts['badge'], fill=(20, 20, 20))
     
     # Brand header with background
     header_height = 120
-    header_bg = Image.new('RGBA', (width, header_height), (0, 0, 0, 50))
-    image.paste(header_bg, (0, 0), header_bg)
+    blend_draw.rectangle([(0, 0), (width - 1, header_height - 1)], fill=(0, 0, 0, 50))
     
     # Brand name
     brand_text = "DENTAL DAILY BRIEF"
@@ -141,10 +305,8 @@ def generate_instagram_image(story, output_path="instagram_post.png"):
     brand_x = (width - text_width_approx) // 2
     
     # Add text shadow for depth
-    draw.text((brand_x + 2, y_position + 2), brand_text, 
-             font=fonts['brand'], fill=(0, 0, 0, 128))
-    draw.text((brand_x, y_position), brand_text, 
-             font=fonts['brand'], fill=white)
+    draw_text(image, (brand_x, y_position), brand_text, 
+              fonts['brand'], fill=white, shadow=(0, 0, 0, 128))
     
     y_position += 70
     
@@ -162,25 +324,22 @@ def generate_instagram_image(story, output_path="instagram_post.png"):
     
     # Title background for better readability
     title_bg_height = len(title_lines[:3]) * 60 + 40
-    title_bg = Image.new('RGBA', (width - 100, title_bg_height), (0, 0, 0, 40))
-    image.paste(title_bg, (50, y_position - 20), title_bg)
+    blend_draw.rectangle([(50, y_position - 20), (width - 51, y_position - 21 + title_bg_height)],
+                         fill=(0, 0, 0, 40))
     
     # Draw title lines with better spacing
     for i, line in enumerate(title_lines[:3]):
         text_width_approx = len(line) * 17
         title_x = (width - text_width_approx) // 2
         
-        # Text shadow
-        draw.text((title_x + 2, y_position + 2), line, 
-                 font=fonts['title'], fill=(0, 0, 0, 128))
-        # Main text
-        draw.text((title_x, y_position), line, 
-                 font=fonts['title'], fill=white)
+        # Main text with shadow
+        draw_text(image, (title_x, y_position), line, 
+                  fonts['title'], fill=white, shadow=(0, 0, 0, 128))
         y_position += 60
     
     if len(title_lines) > 3:
-        draw.text((width//2 - 20, y_position), "...", 
-                 font=fonts['title'], fill=white)
+        draw_text(image, (width//2 - 20, y_position), "...", 
+                  fonts['title'], fill=white)
         y_position += 60
     
     y_position += 30
@@ -192,16 +351,13 @@ def generate_instagram_image(story, output_path="instagram_post.png"):
     
     # Create a card effect for summary
     card_margin = 50
-    card = Image.new('RGBA', (width - 2*card_margin, summary_height), (255, 255, 255, 20))
-    card_draw = ImageDraw.Draw(card)
+    card_y = y_position - 20
     
     # Add gradient to card
     for y in range(summary_height):
         alpha = int(20 + (15 * y / summary_height))
-        card_draw.rectangle([(0, y), (width - 2*card_margin, y + 1)], 
-                           fill=(255, 255, 255, alpha))
-    
-    image.paste(card, (card_margin, y_position - 20), card)
+        blend_draw.rectangle([(card_margin, card_y + y), (width - card_margin - 1, card_y + y)], 
+                             fill=(255, 255, 255, alpha))
     
     y_position += 20
     
@@ -211,28 +367,24 @@ def generate_instagram_image(story, output_path="instagram_post.png"):
         summary_x = (width - text_width_approx) // 2
         
         # Add subtle shadow
-        draw.text((summary_x + 1, y_position + 1), line, 
-                 font=fonts['summary'], fill=(0, 0, 0, 80))
-        draw.text((summary_x, y_position), line, 
-                 font=fonts['summary'], fill=off_white)
+        draw_text(image, (summary_x, y_position), line, 
+                  fonts['summary'], fill=off_white, 
+                  shadow=(0, 0, 0, 80), shadow_offset=(1, 1))
         y_position += 38
     
     if len(summary_lines) > 5:
-        draw.text((width//2 - 15, y_position), "...", 
-                 font=fonts['summary'], fill=off_white)
+        draw_text(image, (width//2 - 15, y_position), "...", 
+                  fonts['summary'], fill=off_white)
     
     # Footer section
     footer_height = 200
     footer_y = height - footer_height
     
     # Create gradient footer
-    footer_overlay = Image.new('RGBA', (width, footer_height), (0, 0, 0, 0))
-    footer_draw = ImageDraw.Draw(footer_overlay)
     for y in range(footer_height):
         alpha = int(0 + (60 * y / footer_height))
-        footer_draw.rectangle([(0, y), (width, y + 1)], 
-                            fill=(0, 0, 0, alpha))
-    image.paste(footer_overlay, (0, footer_y), footer_overlay)
+        blend_draw.rectangle([(0, footer_y + y), (width - 1, footer_y + y)], 
+                             fill=(0, 0, 0, alpha))
     
     # Source
     source = story.get('source', 'DentalDailyBrief.com')
@@ -241,8 +393,8 @@ def generate_instagram_image(story, output_path="instagram_post.png"):
     y_position = height - 140
     text_width_approx = len(source_text) * 10
     source_x = (width - text_width_approx) // 2
-    draw.text((source_x, y_position), source_text, 
-             font=fonts['source'], fill=light_gray)
+    draw_text(image, (source_x, y_position), source_text, 
+              fonts['source'], fill=light_gray)
     
     # Call to action with button effect
     cta_text = "Visit DentalDailyBrief.com"
@@ -267,13 +419,10 @@ def generate_instagram_image(story, output_path="instagram_post.png"):
     
     text_width_approx = len(cta_text) * 12
     cta_x = (width - text_width_approx) // 2
-    draw.text((cta_x, y_position), cta_text, 
-             font=fonts['brand'], fill=white)
-    
-    # Convert back to RGB for Instagram
-    image = image.convert('RGB')
+    draw_text(image, (cta_x, y_position), cta_text, 
+              fonts['brand'], fill=white)
     
-    # Save with high quality
+    # Save with high quality (the canvas is already RGB for Instagram)
     image.save(output_path, 'PNG', quality=95, optimize=True)
     print(f"Instagram image saved to {output_path}")
     
@@ -289,4 +438,4 @@ if __name__ == "__main__":
         'url': 'https://example.com/story'
     }
     
-    generate_instagram_image(test_story)
+    measure_render_memory(test_story)
@@ -74,23 +74,36 @@ def publish_instagram_media(media_id, access_token, account_id):
             print(f"Response: {response.text}")
         return None
 
-def post_to_instagram(image_path, caption):
-    """Main function to post an image to Instagram via Cloudinary."""
+def get_instagram_credentials():
+    """Return (access_token, account_id) from the environment, or None if missing."""
     
-    # Get environment variables
     access_token = os.environ.get('INSTAGRAM_ACCESS_TOKEN')
     account_id = os.environ.get('INSTAGRAM_ACCOUNT_ID')
     
     if not access_token or not account_id:
         print("Error: Instagram credentials not found in environment variables")
-        return False
+        return None
+    
+    return access_token, account_id
+
+def prepare_instagram_post(image_path, caption):
+    """Upload an image and create its Instagram media container ahead of time.
+    
+    Returns a dict describing the ready-to-publish container, or None on failure.
+    Only publish_instagram_media needs to run at the scheduled time.
+    """
+    
+    credentials = get_instagram_credentials()
+    if not credentials:
+        return None
+    access_token, account_id = credentials
     
     print("Uploading image to Cloudinary...")
     image_url = upload_to_cloudinary(image_path)
     
     if not image_url:
         print("Failed to upload image to Cloudinary")
-        return False
+        return None
     
     print(f"Image uploaded successfully: {image_url}")
     
@@ -103,23 +116,59 @@ def post_to_instagram(image_path, caption):
     
     if not media_id:
         print("Failed to create Instagram media object")
-        return False
+        return None
     
     print(f"Media object created: {media_id}")
     
-    # Wait for Instagram to process the media
-    print("Waiting for Instagram to process media...")
-    time.sleep(10)  # Give Instagram more time to process
+    return {
+        'image_url': image_url,
+        'caption': caption,
+        'media_id': media_id,
+        'created_at': time.time()
+    }
+
+def refresh_instagram_media(prepared):
+    """Recreate the media container for a prepared post from its uploaded image.
+    
+    Instagram containers expire after 24 hours, so stale ones must be rebuilt
+    before publishing. Updates and returns the prepared dict, or None on failure.
+    """
+    
+    credentials = get_instagram_credentials()
+    if not credentials:
+        return None
+    access_token, account_id = credentials
+    
+    print("Refreshing Instagram media object...")
+    media_id = create_instagram_media(
+        prepared['image_url'], prepared['caption'], access_token, account_id)
+    
+    if not media_id:
+        print("Failed to refresh Instagram media object")
+        return None
+    
+    print(f"Media object refreshed: {media_id}")
+    prepared['media_id'] = media_id
+    prepared['created_at'] = time.time()
+    return prepared
+
+def publish_prepared_post(prepared):
+    """Publish a media container created earlier by prepare_instagram_post."""
+    
+    credentials = get_instagram_credentials()
+    if not credentials:
+        return False
+    access_token, account_id = credentials
     
     print("Publishing to Instagram...")
-    post_id = publish_instagram_media(media_id, access_token, account_id)
+    post_id = publish_instagram_media(prepared['media_id'], access_token, account_id)
     
     if not post_id:
         print("Failed to publish to Instagram")
         # Try again after a longer wait
         print("Retrying after additional wait...")
         time.sleep(15)
-        post_id = publish_instagram_media(media_id, access_token, account_id)
+        post_id = publish_instagram_media(prepared['media_id'], access_token, account_id)
         
         if not post_id:
             print("Failed to publish after retry")
@@ -128,6 +177,19 @@ def post_to_instagram(image_path, caption):
     print(f"Successfully posted to Instagram! Post ID: {post_id}")
     return True
 
+def post_to_instagram(image_path, caption):
+    """Main function to post an image to Instagram via Cloudinary."""
+    
+    prepared = prepare_instagram_post(image_path, caption)
+    if not prepared:
+        return False
+    
+    # Wait for Instagram to process the media
+    print("Waiting for Instagram to process media...")
+    time.sleep(10)  # Give Instagram more time to process
+    
+    return publish_prepared_post(prepared)
+
 # Test function (optional)
 if __name__ == "__main__":
     # This is just for testing the module independently
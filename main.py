@@ -2,9 +2,14 @@ import json
 import requests
 import time
 import os
+import sys
 import traceback
 from instagram_image_generator import generate_instagram_image
 from instagram_poster_cloudinary import post_to_instagram
+from post_queue import load_queue, enqueue_story, publish_due_posts
+
+# Daily publish slot used by the render-ahead queue (9 AM EST)
+PUBLISH_HOUR_UTC = 14
 
 def load_posted_stories():
     """Load the list of already posted story URLs."""
@@ -95,6 +100,100 @@ def fetch_stories():
         print(f"Error parsing JSON from API: {e}")
         return []
 
+def build_caption(story):
+    """Build the Instagram caption for a story."""
+    title = story.get('title', '')
+    summary = story.get('summary', '')
+    source = story.get('source', 'DentalDailyBrief.com')
+    
+    # Truncate if too long
+    if len(title) > 200:
+        title = title[:197] + "..."
+    if len(summary) > 500:
+        summary = summary[:497] + "..."
+    
+    return f"{title}\n\n{summary}\n\nSource: {source}\n\n#DentalNews #Dentistry #DentalDaily #Healthcare #DentalProfessionals #DentalEducation #OralHealth"
+
+def next_publish_slot():
+    """Return the Unix timestamp of the next daily publish slot (UTC)."""
+    now = time.time()
+    today = now - now % 86400
+    slot = today + PUBLISH_HOUR_UTC * 3600
+    if slot <= now:
+        slot += 86400
+    return slot
+
+def prepare():
+    """Render, upload and create containers for new stories ahead of the publish slot."""
+    print("Preparing queued Instagram posts...")
+    print("=" * 50)
+    
+    stories = fetch_stories()
+    if not stories:
+        print("No valid stories fetched from API")
+        return
+    
+    posted_urls = load_posted_stories()
+    queue = load_queue()
+    queued_urls = [entry['url'] for entry in queue]
+    
+    new_stories = [s for s in stories
+                   if s.get('url') and s['url'] not in posted_urls and s['url'] not in queued_urls]
+    
+    # Same 3-per-slot limit as immediate posting, spaced 30 seconds apart
+    # after anything already due by this slot (including overdue retries)
+    slot = next_publish_slot()
+    already_queued = len([e for e in queue if e['publish_at'] < slot + 86400])
+    remaining = max(0, 3 - already_queued)
+    if remaining == 0:
+        print(f"Slot already has {already_queued} posts queued")
+    
+    prepared_posts = 0
+    failed_posts = 0
+    
+    for i, story in enumerate(new_stories[:remaining]):
+        print(f"\n📝 Queueing story: {story.get('title', 'Untitled')[:60]}...")
+        try:
+            publish_at = slot + (already_queued + i) * 30
+            entry = enqueue_story(story, build_caption(story), publish_at, queue)
+            if entry:
+                print(f"   ✓ Container ready: {entry['media_id']}")
+                prepared_posts += 1
+            else:
+                print(f"   ❌ FAILED: Could not prepare post")
+                failed_posts += 1
+        except Exception as e:
+            print(f"   ❌ ERROR preparing story: {str(e)}")
+            traceback.print_exc()
+            failed_posts += 1
+    
+    print(f"\n✓ {len(queue)} posts queued")
+    
+    if failed_posts > 0 and prepared_posts == 0:
+        print(f"\n⚠️  All posts failed to prepare. Check logs for details.")
+        exit(1)
+
+def publish():
+    """Publish queued posts at their scheduled slots."""
+    print("Publishing queued Instagram posts...")
+    print("=" * 50)
+    
+    posted_urls = load_posted_stories()
+    
+    def record_published(url):
+        # Save after every post so a crash mid-run can't cause a repost
+        posted_urls.append(url)
+        save_posted_stories(posted_urls)
+        print(f"✓ Updated tracking file")
+    
+    published_urls, failed_urls = publish_due_posts(posted_urls, record_published)
+    
+    print(f"\n✨ Published {len(published_urls)} queued stories")
+    
+    if failed_urls and not published_urls:
+        print(f"\n⚠️  All queued posts failed. Check logs for details.")
+        exit(1)
+
 def main():
     """Main function to run the Instagram automation."""
     print("Starting Instagram automation...")
@@ -136,10 +235,11 @@ def main():
     posted_urls = load_posted_stories()
     print(f"✓ Loaded {len(posted_urls)} previously posted story URLs")
     
-    # Filter out already posted stories
+    # Filter out already posted stories and ones waiting in the publish queue
+    queued_urls = [entry['url'] for entry in load_queue()]
     new_stories = []
     for story in stories:
-        if story.get('url') and story['url'] not in posted_urls:
+        if story.get('url') and story['url'] not in posted_urls and story['url'] not in queued_urls:
             new_stories.append(story)
     
     if not new_stories:
@@ -189,17 +289,7 @@ def main():
             print(f"   ✓ Image created: {image_path} ({file_size:.1f} KB)")
             
             # Prepare caption
-            title = story.get('title', '')
-            summary = story.get('summary', '')
-            source = story.get('source', 'DentalDailyBrief.com')
-            
-            # Truncate if too long
-            if len(title) > 200:
-                title = title[:197] + "..."
-            if len(summary) > 500:
-                summary = summary[:497] + "..."
-            
-            caption = f"{title}\n\n{summary}\n\nSource: {source}\n\n#DentalNews #Dentistry #DentalDaily #Healthcare #DentalProfessionals #DentalEducation #OralHealth"
+            caption = build_caption(story)
             
             # Post to Instagram
             print("\n   📤 Posting to Instagram...")
@@ -261,4 +351,11 @@ def main():
         print(f"\n✨ Successfully posted {successful_posts} stories!")
 
 if __name__ == "__main__":
-    main()
+    # "prepare" renders and creates containers ahead of time; "publish" posts them on schedule
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode == "prepare":
+        prepare()
+    elif mode == "publish":
+        publish()
+    else:
+        main()
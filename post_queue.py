@@ -0,0 +1,157 @@
+import json
+import os
+import time
+from instagram_image_generator import generate_instagram_image
+from instagram_poster_cloudinary import (
+    prepare_instagram_post,
+    refresh_instagram_media,
+    publish_prepared_post
+)
+
+QUEUE_FILE = 'post_queue.json'
+
+# Instagram media containers expire after 24 hours; refresh well before that
+CONTAINER_MAX_AGE = 23 * 60 * 60
+
+# Longest a publish run will sleep for an entry's slot; the scheduled publish
+# run starts 15 minutes before the slot, so this covers that lead time
+MAX_PUBLISH_WAIT = 20 * 60
+
+# Failed publish or refresh attempts before a queued post is dropped
+MAX_PUBLISH_ATTEMPTS = 3
+
+def load_queue():
+    """Load the list of prepared posts waiting to be published."""
+    try:
+        with open(QUEUE_FILE, 'r') as f:
+            data = json.load(f)
+            return [item for item in data if isinstance(item, dict) and 'media_id' in item]
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        print(f"Warning: Error reading {QUEUE_FILE}: {e}")
+        return []
+
+def save_queue(queue):
+    """Save the list of prepared posts."""
+    with open(QUEUE_FILE, 'w') as f:
+        json.dump(queue, f, indent=2)
+
+def enqueue_story(story, caption, publish_at, queue=None):
+    """Render, upload and create the media container for a story ahead of time.
+
+    publish_at is a Unix timestamp for the target publish slot.
+    Returns the queued entry, or None if any step failed.
+    """
+    if queue is None:
+        queue = load_queue()
+
+    image_path = f"queued_post_{len(queue)}.png"
+    try:
+        generate_instagram_image(story, image_path)
+        prepared = prepare_instagram_post(image_path, caption)
+    finally:
+        if os.path.exists(image_path):
+            os.remove(image_path)
+
+    if not prepared:
+        return None
+
+    prepared['url'] = story['url']
+    prepared['publish_at'] = publish_at
+    queue.append(prepared)
+    queue.sort(key=lambda entry: entry['publish_at'])
+    save_queue(queue)
+    print(f"Queued post for {time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(publish_at))}")
+    return prepared
+
+def record_failed_attempt(queue, entry):
+    """Count a failed attempt for a queued post, dropping it after too many.
+
+    A dropped post's URL is no longer queued, so a later run can render and
+    prepare it again from scratch.
+    """
+    entry['attempts'] = entry.get('attempts', 0) + 1
+    if entry['attempts'] >= MAX_PUBLISH_ATTEMPTS:
+        print(f"Giving up on queued post after {entry['attempts']} failed attempts: {entry['url']}")
+        queue.remove(entry)
+        save_queue(queue)
+        return True
+
+    print(f"Queued post failed (attempt {entry['attempts']}/{MAX_PUBLISH_ATTEMPTS}), will retry next run: {entry['url']}")
+    save_queue(queue)
+    return False
+
+def refresh_stale_containers(queue=None):
+    """Recreate any queued containers that are close to expiring.
+
+    Returns the URLs of posts whose container could not be refreshed.
+    """
+    if queue is None:
+        queue = load_queue()
+
+    failed_urls = []
+    now = time.time()
+    for entry in list(queue):
+        if now - entry['created_at'] >= CONTAINER_MAX_AGE:
+            if not refresh_instagram_media(entry):
+                failed_urls.append(entry['url'])
+                record_failed_attempt(queue, entry)
+
+    save_queue(queue)
+    return failed_urls
+
+def publish_due_posts(posted_urls, on_published, max_wait=MAX_PUBLISH_WAIT):
+    """Publish queued posts at their scheduled slots.
+
+    Entries whose URL is already in posted_urls are dropped, and stale
+    containers are refreshed first so that only publish_instagram_media runs
+    at the target time. Sleeps until an entry's slot only if it is due within
+    max_wait seconds; later entries are left for a future run.
+    on_published(url) is called as soon as each post goes live.
+    Failed entries stay queued for the next run until they reach
+    MAX_PUBLISH_ATTEMPTS. Returns (published_urls, failed_urls).
+    """
+    queue = load_queue()
+    for entry in [e for e in queue if e['url'] in posted_urls]:
+        print(f"Dropping queued post that was already published: {entry['url']}")
+        queue.remove(entry)
+    failed_urls = refresh_stale_containers(queue)
+    published_urls = []
+
+    i = 0
+    while i < len(queue):
+        entry = queue[i]
+        if entry['url'] in failed_urls:
+            # Its refresh already failed this run; try again next run
+            i += 1
+            continue
+
+        delay = entry['publish_at'] - time.time()
+        if delay > max_wait:
+            break
+        if delay > 0:
+            print(f"Waiting {delay:.0f} seconds until scheduled publish time...")
+            time.sleep(delay)
+
+        # The container may have expired while we were waiting
+        if time.time() - entry['created_at'] >= CONTAINER_MAX_AGE:
+            if not refresh_instagram_media(entry):
+                failed_urls.append(entry['url'])
+                if not record_failed_attempt(queue, entry):
+                    i += 1
+                continue
+
+        if not publish_prepared_post(entry):
+            failed_urls.append(entry['url'])
+            if not record_failed_attempt(queue, entry):
+                i += 1
+            continue
+
+        # Record the post before dequeuing it so a crash in between can't repost it
+        on_published(entry['url'])
+        published_urls.append(entry['url'])
+        queue.pop(i)
+        save_queue(queue)
+
+    return published_urls, failed_urls